@@ -1,5 +1,5 @@
 """
-SQLite storage for job ads and run history.
+SQLite storage for job ads, run history and cached embeddings.
 """
 
 import sqlite3
@@ -9,12 +9,26 @@ from typing import Any
 
 DB_PATH = Path(__file__).parent / "jobsearcher.db"
 
+# Least recently used embeddings beyond this count are evicted
+EMBEDDING_CACHE_SIZE = 10_000
+
+# Stay well under SQLITE_MAX_VARIABLE_NUMBER (999 on older builds)
+_MAX_SQL_VARS = 900
+
+_conn: sqlite3.Connection | None = None
+
 
 def _connect() -> sqlite3.Connection:
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    conn.execute("PRAGMA journal_mode=WAL")
-    return conn
+    """Process-wide connection, so sqlite3's statement cache is reused across calls."""
+    global _conn
+    if _conn is None:
+        _conn = sqlite3.connect(DB_PATH)
+        _conn.row_factory = sqlite3.Row
+        _conn.execute("PRAGMA journal_mode=WAL")
+        _conn.execute("PRAGMA synchronous=NORMAL")
+        _conn.execute("PRAGMA cache_size=-64000")
+        _conn.execute("PRAGMA temp_store=MEMORY")
+    return _conn
 
 
 def init_db() -> None:
@@ -41,6 +55,8 @@ def init_db() -> None:
             query_source TEXT
         );
 
+        CREATE INDEX IF NOT EXISTS idx_ads_final_score ON ads(final_score DESC);
+
         CREATE TABLE IF NOT EXISTS runs (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             run_date TEXT NOT NULL,
@@ -49,59 +65,98 @@ def init_db() -> None:
             embedding_available BOOLEAN,
             status TEXT
         );
+
+        CREATE TABLE IF NOT EXISTS embedding_cache (
+            key TEXT PRIMARY KEY,
+            vector BLOB NOT NULL,
+            scale REAL NOT NULL,
+            last_used TEXT DEFAULT (datetime('now'))
+        );
+
+        CREATE INDEX IF NOT EXISTS idx_embedding_cache_last_used
+            ON embedding_cache(last_used);
     """)
-    conn.close()
 
 
 def upsert_ads(scored_ads: list[dict[str, Any]]) -> int:
     """Insert or update ads. Returns count of newly inserted ads."""
     conn = _connect()
     today = date.today().isoformat()
-    new_count = 0
-
-    for ad in scored_ads:
-        existing = conn.execute("SELECT id FROM ads WHERE id = ?", (ad["id"],)).fetchone()
-        if existing:
-            conn.execute("""
-                UPDATE ads SET
-                    kw_raw = ?, kw_score = ?, similarity = ?, final_score = ?,
-                    last_seen = ?, query_source = ?
-                WHERE id = ?
-            """, (
-                ad["kw_raw"], ad["kw_score"], ad.get("similarity"),
-                ad["final_score"], today, ad.get("query_source", ""),
-                ad["id"],
-            ))
-        else:
-            conn.execute("""
-                INSERT INTO ads (
-                    id, headline, employer, employment_type, publication_date,
-                    application_deadline, webpage_url, description_text,
-                    municipality, region, occupation_group,
-                    kw_raw, kw_score, similarity, final_score,
-                    first_seen, last_seen, query_source
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                ad["id"], ad["headline"], ad.get("employer", ""),
-                ad.get("employment_type", ""), ad.get("publication_date", ""),
-                ad.get("application_deadline", ""), ad.get("webpage_url", ""),
-                ad.get("description_text", ""), ad.get("municipality", ""),
-                ad.get("region", ""), ad.get("occupation_group", ""),
-                ad["kw_raw"], ad["kw_score"], ad.get("similarity"),
-                ad["final_score"], today, today, ad.get("query_source", ""),
-            ))
-            new_count += 1
-
-    conn.commit()
-    conn.close()
-    return new_count
+
+    rows = [(
+        ad["id"], ad["headline"], ad.get("employer", ""),
+        ad.get("employment_type", ""), ad.get("publication_date", ""),
+        ad.get("application_deadline", ""), ad.get("webpage_url", ""),
+        ad.get("description_text", ""), ad.get("municipality", ""),
+        ad.get("region", ""), ad.get("occupation_group", ""),
+        ad["kw_raw"], ad["kw_score"], ad.get("similarity"),
+        ad["final_score"], today, today, ad.get("query_source", ""),
+    ) for ad in scored_ads]
+
+    # Commits on success, rolls back on error so no transaction is left open
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        before = conn.execute("SELECT COUNT(*) FROM ads").fetchone()[0]
+        conn.executemany("""
+            INSERT INTO ads (
+                id, headline, employer, employment_type, publication_date,
+                application_deadline, webpage_url, description_text,
+                municipality, region, occupation_group,
+                kw_raw, kw_score, similarity, final_score,
+                first_seen, last_seen, query_source
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(id) DO UPDATE SET
+                kw_raw = excluded.kw_raw,
+                kw_score = excluded.kw_score,
+                similarity = excluded.similarity,
+                final_score = excluded.final_score,
+                last_seen = excluded.last_seen,
+                query_source = excluded.query_source
+        """, rows)
+        after = conn.execute("SELECT COUNT(*) FROM ads").fetchone()[0]
+    return after - before
+
+
+def get_cached_embeddings(keys: list[str]) -> dict[str, tuple[bytes, float]]:
+    """Cached (int8 BLOB, scale) embeddings by key. Marks hits as recently used."""
+    conn = _connect()
+    embeddings: dict[str, tuple[bytes, float]] = {}
+    # Commits on success, rolls back on error so no transaction is left open
+    with conn:
+        for i in range(0, len(keys), _MAX_SQL_VARS):
+            chunk = keys[i:i + _MAX_SQL_VARS]
+            placeholders = ",".join("?" * len(chunk))
+            rows = conn.execute(
+                f"SELECT key, vector, scale FROM embedding_cache WHERE key IN ({placeholders})",
+                chunk,
+            )
+            embeddings.update((row["key"], (row["vector"], row["scale"])) for row in rows)
+        conn.executemany(
+            "UPDATE embedding_cache SET last_used = datetime('now') WHERE key = ?",
+            [(key,) for key in embeddings],
+        )
+    return embeddings
+
+
+def save_cached_embeddings(embeddings: dict[str, tuple[bytes, float]]) -> None:
+    """Store (int8 BLOB, scale) embeddings by key, evicting the least recently used."""
+    conn = _connect()
+    with conn:
+        conn.executemany("""
+            INSERT OR REPLACE INTO embedding_cache (key, vector, scale, last_used)
+            VALUES (?, ?, ?, datetime('now'))
+        """, [(key, vector, scale) for key, (vector, scale) in embeddings.items()])
+        conn.execute("""
+            DELETE FROM embedding_cache WHERE key NOT IN (
+                SELECT key FROM embedding_cache ORDER BY last_used DESC LIMIT ?
+            )
+        """, (EMBEDDING_CACHE_SIZE,))
 
 
 def record_run(total_fetched: int, total_scored: int, embedding_available: bool, status: str) -> None:
     conn = _connect()
-    conn.execute("""
-        INSERT INTO runs (run_date, total_fetched, total_scored, embedding_available, status)
-        VALUES (?, ?, ?, ?, ?)
-    """, (date.today().isoformat(), total_fetched, total_scored, embedding_available, status))
-    conn.commit()
-    conn.close()
+    with conn:
+        conn.execute("""
+            INSERT INTO runs (run_date, total_fetched, total_scored, embedding_available, status)
+            VALUES (?, ?, ?, ?, ?)
+        """, (date.today().isoformat(), total_fetched, total_scored, embedding_available, status))
@@ -4,9 +4,12 @@ Job fetcher — queries jobtechdev API for relevant job postings.
 Returns a list of raw ad dicts from the API.
 """
 
-import requests
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any
 
+import requests
+from requests.adapters import HTTPAdapter
+
 QUERY_URL = "https://jobsearch.api.jobtechdev.se/search"
 
 GEOGRAPHY = [
@@ -37,13 +40,24 @@ FREETEXT_QUERIES = [
     "informationssäkerhet",
 ]
 
+FREETEXT_HEADERS = {
+    "x-feature-freetext-bool-method": "and",
+    "x-feature-disable-smart-freetext": "true",
+}
+
+MAX_WORKERS = 8
+
+# Shared session so concurrent queries reuse pooled TCP/TLS connections
+_SESSION = requests.Session()
+_SESSION.mount("https://", HTTPAdapter(pool_maxsize=MAX_WORKERS))
+
 
 def _fetch(extra_params: list[tuple[str, str]], headers: dict | None = None) -> list[dict[str, Any]]:
     hdrs = {"accept": "application/json"}
     if headers:
         hdrs.update(headers)
     params = extra_params + [("published-after", "1440"), ("limit", "50")]
-    response = requests.get(QUERY_URL, headers=hdrs, params=params)
+    response = _SESSION.get(QUERY_URL, headers=hdrs, params=params)
     response.raise_for_status()
     return response.json()["hits"]
 
@@ -53,29 +67,26 @@ def fetch_jobs() -> list[dict[str, Any]]:
 
     Returns list of raw API hit dicts, each tagged with 'query_source'.
     """
-    hits_by_id: dict[str, dict[str, Any]] = {}
-
-    # 1. Occupation group query (geography-filtered)
-    for hit in _fetch(GEOGRAPHY + OCCUPATION_GROUPS):
-        hit["query_source"] = "occupation_group"
-        hits_by_id[hit["id"]] = hit
-
+    tasks: list[tuple[list[tuple[str, str]], dict | None, str]] = [
+        # 1. Occupation group query (geography-filtered)
+        (GEOGRAPHY + OCCUPATION_GROUPS, None, "occupation_group"),
+    ]
     # 2. Freetext queries (geography-filtered, precise matching)
-    freetext_headers = {
-        "x-feature-freetext-bool-method": "and",
-        "x-feature-disable-smart-freetext": "true",
-    }
     for query in FREETEXT_QUERIES:
-        for hit in _fetch(GEOGRAPHY + [("q", query)], headers=freetext_headers):
-            if hit["id"] not in hits_by_id:
-                hit["query_source"] = f"freetext:{query}"
-            hits_by_id[hit["id"]] = hit
-
+        tasks.append((GEOGRAPHY + [("q", query)], FREETEXT_HEADERS, f"freetext:{query}"))
     # 3. Remote jobs (no geography filter) — catches nationwide remote positions
     for query in FREETEXT_QUERIES:
-        for hit in _fetch([("q", query), ("remote", "true")], headers=freetext_headers):
+        tasks.append(([("q", query), ("remote", "true")], FREETEXT_HEADERS, f"remote:{query}"))
+
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as ex:
+        results = list(ex.map(lambda t: _fetch(t[0], t[1]), tasks))
+
+    # Fold in task order so the first query to find an ad keeps its source tag
+    hits_by_id: dict[str, dict[str, Any]] = {}
+    for (_, _, source), hits in zip(tasks, results):
+        for hit in hits:
             if hit["id"] not in hits_by_id:
-                hit["query_source"] = f"remote:{query}"
-            hits_by_id[hit["id"]] = hit
+                hit["query_source"] = source
+                hits_by_id[hit["id"]] = hit
 
     return list(hits_by_id.values())
@@ -6,12 +6,11 @@ Fetches job ads from jobtechdev, scores them, stores in SQLite,
 writes ranked results markdown, and commits to git.
 """
 
+import subprocess
 import sys
 from datetime import datetime, date
 from pathlib import Path
 
-import git
-
 from fetcher import fetch_jobs
 from scorer import score_ads
 from db import init_db, upsert_ads, record_run
@@ -24,26 +23,23 @@ def log(msg: str) -> None:
 
 
 def write_results(ranked: list[dict], embedding_available: bool, output_file: Path) -> None:
-    lines = [f"# Job search results — {date.today()}\n"]
-
-    if embedding_available:
-        lines.append("Ranked by combined keyword + embedding similarity score.\n")
-    else:
-        lines.append("Ranked by keyword score only (embedding unavailable).\n")
+    output_file.parent.mkdir(parents=True, exist_ok=True)
+    with output_file.open("w", encoding="utf-8") as f:
+        f.write(f"# Job search results — {date.today()}\n\n")
 
-    lines += [
-        "| Rank | Headline | Company | KW | Sim | URL |",
-        "|------|----------|---------|-----|-----|-----|",
-    ]
+        if embedding_available:
+            f.write("Ranked by combined keyword + embedding similarity score.\n\n")
+        else:
+            f.write("Ranked by keyword score only (embedding unavailable).\n\n")
 
-    for i, job in enumerate(ranked, 1):
-        headline = job["headline"].replace("|", "\\|")
-        company = job["employer"].replace("|", "\\|")
-        sim_str = f"{job['similarity']:.3f}" if job["similarity"] is not None else "—"
-        lines.append(f"| {i} | {headline} | {company} | {job['kw_score']} | {sim_str} | {job['webpage_url']} |")
+        f.write("| Rank | Headline | Company | KW | Sim | URL |\n")
+        f.write("|------|----------|---------|-----|-----|-----|\n")
 
-    output_file.parent.mkdir(parents=True, exist_ok=True)
-    output_file.write_text("\n".join(lines) + "\n", encoding="utf-8")
+        for i, job in enumerate(ranked, 1):
+            headline = job["headline"].replace("|", "\\|")
+            company = job["employer"].replace("|", "\\|")
+            sim_str = f"{job['similarity']:.3f}" if job["similarity"] is not None else "—"
+            f.write(f"| {i} | {headline} | {company} | {job['kw_score']} | {sim_str} | {job['webpage_url']} |\n")
 
 
 def main() -> int:
@@ -94,14 +90,28 @@ def main() -> int:
         log(f"  kw={job['kw_score']}{sim_str} — {job['headline']}")
 
     # Step 5: Git commit
+    git = ["git", "-C", str(RESULTS_DIR)]
     try:
-        repo = git.Repo(RESULTS_DIR)
-        repo.index.add([str(output_file.relative_to(RESULTS_DIR))])
-        if repo.is_dirty() or repo.untracked_files:
-            repo.index.commit(f"job results {date.today().strftime('%Y-%m-%d')}")
+        # git -C searches parent directories; only commit if RESULTS_DIR is the repo root
+        toplevel = subprocess.run(git + ["rev-parse", "--show-toplevel"],
+                                  check=True, capture_output=True, text=True).stdout.strip()
+        if Path(toplevel).resolve() != RESULTS_DIR.resolve():
+            raise RuntimeError(f"{RESULTS_DIR} is not a git repository (inside {toplevel})")
+        subprocess.run(git + ["add", str(output_file.relative_to(RESULTS_DIR))],
+                       check=True, capture_output=True, text=True)
+        # Exit status 1 means the index differs from HEAD
+        staged = subprocess.run(git + ["diff", "--cached", "--quiet"])
+        if staged.returncode == 1:
+            subprocess.run(git + ["commit", "-m", f"job results {date.today().strftime('%Y-%m-%d')}"],
+                           check=True, capture_output=True, text=True)
             log("Committed to git")
-        else:
+        elif staged.returncode == 0:
             log("No changes to commit")
+        else:
+            raise RuntimeError(f"git diff exited with status {staged.returncode}")
+    except subprocess.CalledProcessError as e:
+        log(f"Git commit failed: {(e.stderr or '').strip() or e}")
+        return 4
     except Exception as e:
         log(f"Git commit failed: {e}")
         return 4
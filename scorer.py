@@ -4,15 +4,22 @@ Job scoring — keyword matching + embedding reranking.
 Accepts raw API ad dicts and returns scored/ranked results.
 """
 
-import json
+import hashlib
 import os
 import re
-import urllib.error
-import urllib.request
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from pathlib import Path
 from typing import Any
 
+import ahocorasick
 import numpy as np
+import orjson
+import requests
+from requests.adapters import HTTPAdapter
+
+from db import get_cached_embeddings, save_cached_embeddings
 
 # Embedding server config — override via environment variables
 EMBED_URL = os.getenv("EMBED_URL", "http://localhost:9090/v1/embeddings")
@@ -28,19 +35,64 @@ EMBED_MAX_CHARS = 2000
 # Stopword filtering
 # ---------------------------------------------------------------------------
 
-def _load_stopwords() -> set[str]:
-    if not STOPWORDS_FILE.exists():
-        return set()
-    return set(STOPWORDS_FILE.read_text(encoding="utf-8").splitlines())
+@lru_cache(maxsize=1)
+def _read_stopwords(path: Path, mtime_ns: int) -> frozenset[str]:
+    return frozenset(path.read_text(encoding="utf-8").splitlines())
+
 
-_STOPWORDS: set[str] = _load_stopwords()
+def _stopwords() -> frozenset[str]:
+    """Stopword list, re-read only when the file's mtime changes."""
+    try:
+        mtime_ns = STOPWORDS_FILE.stat().st_mtime_ns
+    except FileNotFoundError:
+        return frozenset()
+    return _read_stopwords(STOPWORDS_FILE, mtime_ns)
 
 
 def strip_stopwords(text: str) -> str:
-    if not _STOPWORDS:
-        return text
-    words = re.split(r"(\s+)", text)
-    return "".join(w for w in words if w.strip() == "" or w.lower() not in _STOPWORDS)
+    """Lowercase, drop stopwords and collapse whitespace to single spaces."""
+    stopwords = _stopwords()
+    return " ".join(w for w in text.lower().split() if w not in stopwords)
+
+
+def embed_snippet(text: str) -> str:
+    """Stopword-filtered text truncated to EMBED_MAX_CHARS for embedding.
+
+    Only a generous prefix of long texts is filtered; the full text is used
+    only if that prefix filters down to less than EMBED_MAX_CHARS.
+    """
+    limit = EMBED_MAX_CHARS * 3
+    if len(text) > limit:
+        snippet = strip_stopwords(text[:limit])
+        # The last word may have been cut; everything before its space is exact
+        if snippet.rfind(" ") >= EMBED_MAX_CHARS:
+            return snippet[:EMBED_MAX_CHARS]
+    return strip_stopwords(text)[:EMBED_MAX_CHARS]
+
+
+# ---------------------------------------------------------------------------
+# Resume
+# ---------------------------------------------------------------------------
+
+@lru_cache(maxsize=1)
+def _read_resume(path: Path, mtime_ns: int, stopwords: frozenset[str]) -> tuple[str, str]:
+    # stopwords is only part of the cache key: editing the list changes the snippet
+    snippet = embed_snippet(path.read_text(encoding="utf-8"))
+    return snippet, embedding_cache_key(snippet)
+
+
+def _resume_snippet() -> tuple[str, str] | None:
+    """Embedding snippet of the resume and its cache key.
+
+    Re-read and re-filtered only when the file's mtime or the stopword list
+    changes; the vector itself lives in the embedding cache under the
+    returned key.
+    """
+    try:
+        mtime_ns = RESUME_FILE.stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+    return _read_resume(RESUME_FILE, mtime_ns, _stopwords())
 
 
 # ---------------------------------------------------------------------------
@@ -101,31 +153,63 @@ NEGATIVE_KEYWORDS = [
 # (e.g. "soc" in "associated", "edr" in "pedagogy", "xdr" in random text)
 _WORD_BOUNDARY_KEYWORDS = {"soc", "edr", "xdr", "m365", "kql", "gdpr", "nis2", "dora"}
 
+_WORD_CHAR = re.compile(r"\w")
+
+# Weight per keyword; negative keywords carry weight 0 and are penalised separately
+_NEGATIVE = 0
+
+# Words that soften the negative-keyword penalty; matched by the same automaton
+# so scoring stays a single pass over the text
+_SECURITY_CONTEXT = ("säkerhet", "security")
+_CONTEXT = -1
+
+_KEYWORD_WEIGHTS: tuple[tuple[str, int], ...] = tuple(
+    (kw, weight)
+    for weight, group in ((3, "high"), (2, "medium"))
+    for kw in PROFILE_KEYWORDS[group]
+) + tuple((kw, _NEGATIVE) for kw in NEGATIVE_KEYWORDS)
+
+
+def _build_automaton() -> ahocorasick.Automaton:
+    automaton = ahocorasick.Automaton()
+    for kw, weight in _KEYWORD_WEIGHTS:
+        # Precompute everything the scan needs so the hot loop does no lookups
+        automaton.add_word(kw, (kw, weight, len(kw) - 1, kw in _WORD_BOUNDARY_KEYWORDS))
+    for word in _SECURITY_CONTEXT:
+        automaton.add_word(word, (word, _CONTEXT, len(word) - 1, False))
+    automaton.make_automaton()
+    return automaton
+
+_KEYWORD_AUTOMATON = _build_automaton()
+
 
-def _keyword_in_text(kw: str, text: str) -> bool:
-    if kw in _WORD_BOUNDARY_KEYWORDS:
-        return bool(re.search(rf"\b{re.escape(kw)}\b", text))
-    return kw in text
+def _is_whole_word(text: str, start: int, end: int) -> bool:
+    before = text[start - 1] if start > 0 else ""
+    after = text[end + 1] if end + 1 < len(text) else ""
+    return not (_WORD_CHAR.match(before) or _WORD_CHAR.match(after))
 
 
 def score_job_keywords(text: str) -> int:
-    """Raw keyword score (not normalised)."""
-    text = text.lower()
-    score = 0
-    for kw in PROFILE_KEYWORDS["high"]:
-        if _keyword_in_text(kw, text):
-            score += 3
-    for kw in PROFILE_KEYWORDS["medium"]:
-        if _keyword_in_text(kw, text):
-            score += 2
-
-    penalty = 0
-    for kw in NEGATIVE_KEYWORDS:
-        if _keyword_in_text(kw, text):
-            if "säkerhet" in text or "security" in text:
-                penalty += 1
-            else:
-                penalty += 3
+    """Raw keyword score (not normalised). Expects lowercase text."""
+    # Single pass over the text; each keyword counts once regardless of repeats
+    found: dict[str, int] = {}
+    has_security_context = False
+    for end, (kw, weight, span, whole_word) in _KEYWORD_AUTOMATON.iter(text):
+        if weight == _CONTEXT:
+            has_security_context = True
+            continue
+        if kw in found:
+            continue
+        if whole_word and not _is_whole_word(text, end - span, end):
+            continue
+        found[kw] = weight
+
+    score = sum(found.values())
+    negatives = sum(1 for weight in found.values() if weight == _NEGATIVE)
+    if negatives:
+        penalty = negatives * (1 if has_security_context else 3)
+    else:
+        penalty = 0
 
     return max(0, score - penalty)
 
@@ -144,41 +228,157 @@ def normalise_score(raw: int) -> int:
 # Embeddings
 # ---------------------------------------------------------------------------
 
-def get_embedding(text: str) -> list[float]:
-    data = json.dumps({"model": EMBED_MODEL, "input": text}).encode()
-    req = urllib.request.Request(
-        EMBED_URL, data=data,
-        headers={"Content-Type": "application/json"},
+EMBED_MAX_WORKERS = 8
+
+# Keep-alive session so repeated requests reuse the connection to the server;
+# the pool is sized for the concurrent one-per-text fallback
+_SESSION = requests.Session()
+_SESSION.mount("http://", HTTPAdapter(pool_maxsize=EMBED_MAX_WORKERS))
+_SESSION.mount("https://", HTTPAdapter(pool_maxsize=EMBED_MAX_WORKERS))
+
+
+def _request_embeddings(texts: str | list[str]) -> list[list[float]]:
+    response = _SESSION.post(
+        EMBED_URL, data=orjson.dumps({"model": EMBED_MODEL, "input": texts}),
+        headers={"Content-Type": "application/json"}, timeout=30,
     )
+    response.raise_for_status()
+    resp = orjson.loads(response.content)
+    return [d["embedding"] for d in sorted(resp["data"], key=lambda d: d["index"])]
+
+
+def get_embeddings(texts: list[str]) -> list[list[float]]:
+    """Embed a batch of texts, preserving input order.
+
+    Sends one batched request; if the server rejects or truncates list input,
+    falls back to concurrent single-text requests. A single text is always
+    sent as a plain string.
+    """
+    if not texts:
+        return []
+    batched = len(texts) > 1
     try:
-        resp = json.loads(urllib.request.urlopen(req, timeout=30).read())
-    except urllib.error.URLError as e:
+        try:
+            vecs = _request_embeddings(texts if batched else texts[0])
+        except requests.HTTPError as e:
+            # 400/422 is how servers without batch support reject list input;
+            # anything else (auth, payload size, ...) would fail per text too
+            if not batched or e.response.status_code not in (400, 422):
+                raise
+            vecs = []
+        if batched and len(vecs) != len(texts):
+            with ThreadPoolExecutor(max_workers=EMBED_MAX_WORKERS) as executor:
+                vecs = [v[0] for v in executor.map(_request_embeddings, texts)]
+    except requests.RequestException as e:
         raise RuntimeError(f"Embedding server unavailable at {EMBED_URL}: {e}") from e
-    return resp["data"][0]["embedding"]
+    if len(vecs) != len(texts):
+        raise RuntimeError(f"Embedding server returned {len(vecs)} vectors for {len(texts)} texts")
+    return vecs
+
+
+def get_embedding(text: str) -> list[float]:
+    return get_embeddings([text])[0]
+
+
+def embedding_cache_key(text: str) -> str:
+    """Cache key for an embedding; includes the model so swapping it invalidates."""
+    return hashlib.sha1(f"{EMBED_MODEL}\0{text}".encode()).hexdigest()
+
 
+def _cache_get(keys: list[str]) -> dict[str, tuple[bytes, float]]:
+    """Cached embeddings by key; an unavailable cache counts as all misses."""
+    try:
+        return get_cached_embeddings(keys)
+    except sqlite3.Error as e:
+        print(f"Warning: embedding cache unavailable: {e}")
+        return {}
+
+
+def _cache_save(embeddings: dict[str, tuple[bytes, float]]) -> None:
+    """Best-effort cache write; a failure only costs a re-embed next run."""
+    try:
+        save_cached_embeddings(embeddings)
+    except sqlite3.Error as e:
+        print(f"Warning: could not save embeddings to cache: {e}")
 
-def cosine_similarity(a: list[float], b: list[float]) -> float:
-    va, vb = np.array(a), np.array(b)
-    denom = np.linalg.norm(va) * np.linalg.norm(vb)
-    if denom == 0:
-        return 0.0
-    return float(np.dot(va, vb) / denom)
+
+def quantize(vec: list[float] | np.ndarray) -> tuple[bytes, float]:
+    """Symmetric int8 quantisation. Returns (int8 bytes, scale)."""
+    v = np.asarray(vec, dtype=np.float32)
+    scale = float(np.max(np.abs(v))) / 127 or 1.0
+    return np.round(v / scale).astype(np.int8).tobytes(), scale
+
+
+def cosine_similarities(query: np.ndarray, vectors: np.ndarray) -> np.ndarray:
+    """Cosine similarity of one query against many vectors as a single matvec.
+
+    Takes a 1-D query and a 2-D matrix of any numeric dtype (the cached int8
+    vectors included); both are normalised as float32.
+    """
+    if len(vectors) == 0:
+        return np.empty(0, dtype=np.float32)
+    m = np.asarray(vectors, dtype=np.float32)
+    m = m / (np.linalg.norm(m, axis=1, keepdims=True) + 1e-12)
+    q = np.asarray(query, dtype=np.float32)
+    q = q / (np.linalg.norm(q) + 1e-12)
+    return m @ q
 
 
 # ---------------------------------------------------------------------------
 # Scoring pipeline
 # ---------------------------------------------------------------------------
 
+def _nested(ad: dict[str, Any], key: str, field: str) -> Any:
+    """ad[key][field], or "" if the key is missing or not an object."""
+    value = ad.get(key)
+    return value.get(field, "") if isinstance(value, dict) else ""
+
+
 def _extract_text(ad: dict[str, Any]) -> str:
     """Build searchable text from a raw API ad dict."""
     parts = [
         ad.get("headline", ""),
-        ad.get("employer", {}).get("name", "") if isinstance(ad.get("employer"), dict) else "",
-        ad.get("description", {}).get("text", "") if isinstance(ad.get("description"), dict) else "",
+        _nested(ad, "employer", "name"),
+        _nested(ad, "description", "text"),
     ]
     return "\n".join(parts)
 
 
+def _ad_fields(ad: dict[str, Any]) -> dict[str, Any]:
+    """Descriptive (non-score) fields of a result dict."""
+    return {
+        "id": ad["id"],
+        "headline": ad.get("headline", ""),
+        "employer": _nested(ad, "employer", "name"),
+        "employment_type": _nested(ad, "employment_type", "label"),
+        "publication_date": ad.get("publication_date", ""),
+        "application_deadline": ad.get("application_deadline", ""),
+        "webpage_url": ad.get("webpage_url", ""),
+        "description_text": _nested(ad, "description", "text"),
+        "municipality": _nested(ad, "workplace_address", "municipality"),
+        "region": _nested(ad, "workplace_address", "region"),
+        "occupation_group": _nested(ad, "occupation_group", "label"),
+        "query_source": ad.get("query_source", ""),
+    }
+
+
+def _keyword_scores(ads: list[dict[str, Any]]) -> tuple[np.ndarray, np.ndarray]:
+    """Raw and normalised keyword scores, one array element per ad."""
+    # Stopwords are not stripped before scoring. Filtering drops whole words, so
+    # it could only matter if a stopword contained a keyword; the ones that do
+    # ("nedre" -> "edr", "associerad" -> "soc") are all in _WORD_BOUNDARY_KEYWORDS
+    # and never match inside a longer word. Any keyword added that occurs inside
+    # a stopword must be boundary-checked too. Whitespace runs are collapsed the
+    # same way strip_stopwords does, so phrases such as "zero trust" also match
+    # across line breaks and repeated spaces.
+    kw_raw = np.fromiter(
+        (score_job_keywords(" ".join(_extract_text(ad).lower().split())) for ad in ads),
+        dtype=np.int32, count=len(ads),
+    )
+    kw_score = np.fromiter((normalise_score(raw) for raw in kw_raw), dtype=np.int32, count=len(ads))
+    return kw_raw, kw_score
+
+
 def score_ads(
     ads: list[dict[str, Any]],
     top_n: int = 20,
@@ -192,71 +392,77 @@ def score_ads(
     municipality, region, occupation_group, query_source,
     kw_raw, kw_score, similarity, final_score.
     """
-    # Build scored list
-    scored = []
-    for ad in ads:
-        full_text = _extract_text(ad)
-        filtered_text = strip_stopwords(full_text.lower())
-        kw_raw = score_job_keywords(filtered_text)
-        kw_score = normalise_score(kw_raw)
-
-        scored.append({
-            "id": ad["id"],
-            "headline": ad.get("headline", ""),
-            "employer": ad.get("employer", {}).get("name", "") if isinstance(ad.get("employer"), dict) else "",
-            "employment_type": ad.get("employment_type", {}).get("label", "") if isinstance(ad.get("employment_type"), dict) else "",
-            "publication_date": ad.get("publication_date", ""),
-            "application_deadline": ad.get("application_deadline", ""),
-            "webpage_url": ad.get("webpage_url", ""),
-            "description_text": ad.get("description", {}).get("text", "") if isinstance(ad.get("description"), dict) else "",
-            "municipality": ad.get("workplace_address", {}).get("municipality", "") if isinstance(ad.get("workplace_address"), dict) else "",
-            "region": ad.get("workplace_address", {}).get("region", "") if isinstance(ad.get("workplace_address"), dict) else "",
-            "occupation_group": ad.get("occupation_group", {}).get("label", "") if isinstance(ad.get("occupation_group"), dict) else "",
-            "query_source": ad.get("query_source", ""),
-            "kw_raw": kw_raw,
-            "kw_score": kw_score,
-            "similarity": None,
-            "final_score": kw_score / 10.0,
-            "_full_text": full_text,
-        })
-
-    if not scored:
+    if not ads:
         return [], False
 
-    # Embedding reranking
+    # The resume rarely changes; reuse its cached vector when the text matches,
+    # otherwise embed it in the background while keyword scoring runs
+    resume = _resume_snippet() if use_embeddings else None
+    resume_vec = resume_future = None
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        if resume is not None:
+            resume_snippet, resume_key = resume
+            cached = _cache_get([resume_key])
+            if cached:
+                resume_vec = np.frombuffer(cached[resume_key][0], dtype=np.int8)
+            else:
+                resume_future = executor.submit(get_embedding, resume_snippet)
+
+        # Scores are kept column-wise; index i in every array refers to ads[i]
+        kw_raw, kw_score = _keyword_scores(ads)
+
+    similarity = np.full(len(ads), np.nan)
+    final_score = kw_score / 10.0
+
+    # Embedding reranking of the top-N candidates
     embedding_available = False
-    if use_embeddings and RESUME_FILE.exists():
+    if resume is not None:
+        # Take top-N by keyword for embedding
+        top = np.argsort(-kw_raw, kind="stable")[:top_n]
+
+        # Snippets are built only for candidates; the text already leads with the headline
+        snippets = [embed_snippet(_extract_text(ads[i])) for i in top]
+        keys = [embedding_cache_key(snippet) for snippet in snippets]
+
+        # Ads persist for days; only embed snippets not seen before
+        cached = _cache_get(keys)
+        misses = {key: snippet for key, snippet in zip(keys, snippets) if key not in cached}
         try:
-            resume_text = RESUME_FILE.read_text(encoding="utf-8")
-            resume_vec = get_embedding(strip_stopwords(resume_text)[:EMBED_MAX_CHARS])
+            cached_resume = {}
+            if resume_future is not None:
+                cached_resume[resume_key] = quantize(resume_future.result())
+                resume_vec = np.frombuffer(cached_resume[resume_key][0], dtype=np.int8)
+            new_vecs = get_embeddings(list(misses.values())) if misses else []
             embedding_available = True
         except RuntimeError as e:
             print(f"Warning: {e}\nFalling back to keyword-only scoring.")
+        else:
+            fresh = {key: quantize(vec) for key, vec in zip(misses, new_vecs)}
+            _cache_save(cached_resume | fresh)
+            cached |= fresh
+            # Rows are L2-normalised for cosine, so the per-vector scale cancels
+            # and the int8 blobs can be stacked into one matrix directly
+            job_matrix = np.frombuffer(
+                b"".join(cached[key][0] for key in keys), dtype=np.int8,
+            ).reshape(len(top), resume_vec.size)
 
     if embedding_available:
-        # Take top-N by keyword for embedding
-        candidates = sorted(scored, key=lambda j: -j["kw_raw"])[:top_n]
-        candidate_ids = {j["id"] for j in candidates}
-
-        for i, job in enumerate(candidates):
-            snippet = strip_stopwords(f"{job['headline']}\n{job['_full_text']}")[:EMBED_MAX_CHARS]
-            try:
-                job_vec = get_embedding(snippet)
-                job["similarity"] = cosine_similarity(resume_vec, job_vec)
-            except RuntimeError as e:
-                print(f"  Warning: embedding failed for job {i + 1}: {e}")
-                job["similarity"] = 0.0
-            job["final_score"] = 0.4 * (job["kw_score"] / 10.0) + 0.6 * job["similarity"]
-            print(f"  [{i + 1}/{len(candidates)}] {job['headline'][:60]} "
-                  f"(kw={job['kw_score']}, sim={job['similarity']:.3f})")
-
-        for job in scored:
-            if job["id"] not in candidate_ids:
-                job["final_score"] = job["kw_score"] / 10.0 * 0.4
-
-    # Clean up internal field
-    for job in scored:
-        del job["_full_text"]
-
-    ranked = sorted(scored, key=lambda j: -j["final_score"])
-    return ranked[:final_n], embedding_available
+        # Every ad keeps the keyword share; candidates add the similarity share
+        final_score = kw_score / 10.0 * 0.4
+        similarity[top] = cosine_similarities(resume_vec, job_matrix)
+        final_score[top] += 0.6 * similarity[top]
+        for n, i in enumerate(top, 1):
+            print(f"  [{n}/{len(top)}] {ads[i].get('headline', '')[:60]} "
+                  f"(kw={kw_score[i]}, sim={similarity[i]:.3f})")
+
+    # Result dicts are only materialised for the rows actually returned
+    ranked = [
+        _ad_fields(ads[i]) | {
+            "kw_raw": int(kw_raw[i]),
+            "kw_score": int(kw_score[i]),
+            "similarity": None if np.isnan(similarity[i]) else float(similarity[i]),
+            "final_score": float(final_score[i]),
+        }
+        for i in np.argsort(-final_score, kind="stable")[:final_n]
+    ]
+    return ranked, embedding_available